@@ -0,0 +1,202 @@
+# scripts/arrow_ipc.py
+# 功能：把按 (code, date) 排好序的合并数据导出为 Arrow IPC (Feather v2) 文件 + 按股票的偏移索引，
+#       并提供内存映射加载函数，供研究环境毫秒级加载、多进程共享 OS page cache
+#
+# 导出文件：
+#   full_kdata.arrow              Arrow IPC 文件（不压缩或 LZ4）
+#   full_kdata.arrow.index.json   {"codes": {code: [batch 序号, batch 内起始行, 行数]}, ...}
+# 每个 record batch 只在股票边界处切分，因此任一股票的数据都落在同一个 batch 内。
+# 按股票加载时只读取所需的 batch：不压缩时返回直接指向 mmap 区域的零拷贝视图，
+# LZ4 时只解压这些 batch（BATCH_ROWS 越小，按股票加载时解压的数据越少）。
+# 浮点列的 null 在导出时统一填成 NaN，使其没有 validity bitmap，可以零拷贝转成 NumPy。
+#
+# CI 流水线默认不导出也不上传 .arrow 文件（体积大、且需在使用者本机 mmap），
+# 研究环境下载 full_*.parquet 后用下面的命令行在本地转换即可。
+#
+# 用法：
+#   python scripts/arrow_ipc.py full_kdata.parquet [lz4]     # 把已下载的 parquet 转成 .arrow
+#   from arrow_ipc import load_arrow, load_numpy
+#   table = load_arrow("full_kdata.arrow", codes=["sh.600000"])
+#   arrays = load_numpy("full_kdata.arrow", codes=["sh.600000"], columns=["close", "volume"])
+
+import os
+import sys
+import json
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+COMPRESSIONS = {"uncompressed": None, "lz4": "lz4"}
+BATCH_ROWS = 100_000            # 每个 record batch 的目标行数（实际在股票边界处切分）
+
+def index_path(path: str) -> str:
+    return path + ".index.json"
+
+# ==================== 导出 ====================
+def _fill_float_nulls(batch: pa.RecordBatch) -> pa.RecordBatch:
+    columns = [
+        pc.fill_null(col, float("nan")) if pa.types.is_floating(col.type) and col.null_count else col
+        for col in batch.columns
+    ]
+    return pa.RecordBatch.from_arrays(columns, schema=batch.schema)
+
+def write_arrow_ipc(batches, schema: pa.Schema, path: str, compression: str = "uncompressed") -> int:
+    """
+    把按 code 排好序的 record batch 流写成 Arrow IPC 文件及其偏移索引，返回写入行数。
+    batches 可以是任意大小的批次（如 ParquetFile.iter_batches() 或 Table.to_batches()）。
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"未知的 Arrow IPC 压缩方式: {compression}（可选: {', '.join(COMPRESSIONS)}）")
+
+    codes = {}
+    rows_written = 0
+    batches_written = 0
+    pending = []                # 尚未写出的批次，最后一只股票可能还没读完
+    pending_rows = 0
+    options = pa.ipc.IpcWriteOptions(compression=COMPRESSIONS[compression])
+    tmp_path = path + ".tmp"
+    tmp_index = index_path(path) + ".tmp"
+
+    def flush(table: pa.Table):
+        nonlocal rows_written, batches_written
+        if table.num_rows == 0:
+            return
+        batch = _fill_float_nulls(table.combine_chunks().to_batches()[0])
+        # 连续相同的 code 构成一段：记录每段所在的 batch、batch 内起始行和行数
+        code_col = batch.column("code")
+        n = len(code_col)
+        changed = pc.not_equal(code_col.slice(1), code_col.slice(0, n - 1))
+        starts = [0, *(pc.indices_nonzero(changed).to_numpy() + 1).tolist()]
+        for start, end in zip(starts, [*starts[1:], n]):
+            code = code_col[start].as_py()
+            if code in codes:
+                raise ValueError(f"输入未按 code 排序：{code} 出现在多个不连续区间")
+            codes[code] = [batches_written, start, end - start]
+        writer.write_batch(batch)
+        rows_written += batch.num_rows
+        batches_written += 1
+
+    def flush_full(table: pa.Table) -> pa.Table:
+        """按 BATCH_ROWS 在股票边界处切出并写出完整的 batch，返回尚未写出的剩余部分"""
+        while table.num_rows > BATCH_ROWS:
+            # 切在第 BATCH_ROWS 行所属股票的末尾
+            boundary_code = table.column("code")[BATCH_ROWS - 1]
+            changed = pc.indices_nonzero(pc.not_equal(table.column("code").slice(BATCH_ROWS), boundary_code))
+            if len(changed) == 0:
+                break           # 该股票可能还没读完，留到下一批
+            cut = BATCH_ROWS + changed[0].as_py()
+            flush(table.slice(0, cut))
+            table = table.slice(cut)
+        return table
+
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, schema, options=options) as writer:
+            for batch in batches:
+                if batch.num_rows == 0:
+                    continue
+                pending.append(batch)
+                pending_rows += batch.num_rows
+                if pending_rows <= BATCH_ROWS:
+                    continue
+                table = flush_full(pa.Table.from_batches(pending, schema=schema))
+                pending = table.to_batches()
+                pending_rows = table.num_rows
+            flush(pa.Table.from_batches(pending, schema=schema))
+
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows_written, "batches": batches_written, "compression": compression,
+                       "codes": codes}, f, ensure_ascii=False)
+    except BaseException:
+        for tmp in (tmp_path, tmp_index):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
+
+    # 先删旧索引再替换数据文件：中途崩溃时宁可缺索引(加载时报错)，也不让新数据配旧索引
+    if os.path.exists(index_path(path)):
+        os.remove(index_path(path))
+    os.replace(tmp_path, path)
+    os.replace(tmp_index, index_path(path))
+    return rows_written
+
+def export_parquet(parquet_path: str, path: str, compression: str = "uncompressed") -> int:
+    """流式读取已排好序的合并 parquet 文件并导出为 Arrow IPC，内存占用约为一个 batch"""
+    pf = pq.ParquetFile(parquet_path)
+    return write_arrow_ipc(pf.iter_batches(batch_size=BATCH_ROWS), pf.schema_arrow, path, compression)
+
+# ==================== 加载 ====================
+def load_index(path: str) -> dict:
+    with open(index_path(path), encoding="utf-8") as f:
+        return json.load(f)
+
+def _open(path: str):
+    """内存映射打开 IPC 文件并读取索引；索引与文件的 batch 数不符时抛出 ValueError"""
+    reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    index = load_index(path)
+    # 只比对 batch 数：逐个 batch 数行会让 LZ4 文件整体解压
+    if reader.num_record_batches != index["batches"]:
+        raise ValueError(f"{index_path(path)} 与 {path} 不匹配（索引 {index['batches']} 个 batch，"
+                         f"文件 {reader.num_record_batches} 个），请重新导出")
+    return reader, index["codes"]
+
+def _code_batches(reader, index: dict, codes, columns=None):
+    """逐个产出 (code, RecordBatch)，只读取（LZ4 时只解压）这些股票所在的 batch"""
+    loaded = {}
+    for code in codes:
+        if code not in index:
+            continue
+        batch_idx, start, length = index[code]
+        if batch_idx not in loaded:
+            batch = reader.get_batch(batch_idx)
+            loaded[batch_idx] = batch.select(columns) if columns is not None else batch
+        if start + length > loaded[batch_idx].num_rows:
+            raise ValueError(f"{code} 的索引超出第 {batch_idx} 个 batch 的行数，索引与数据文件不匹配，请重新导出")
+        yield code, loaded[batch_idx].slice(start, length)
+
+def load_arrow(path: str, codes=None, columns=None) -> pa.Table:
+    """
+    内存映射打开 Arrow IPC 文件，返回所选股票/列的 Table。
+    不压缩的文件返回零拷贝视图（数据页由 OS page cache 在进程间共享）；LZ4 文件只解压所选股票所在的 batch。
+    """
+    if columns is not None:
+        columns = ["code", *[c for c in columns if c != "code"]]
+    reader, index = _open(path)
+    if codes is None:
+        table = reader.read_all()
+        return table.select(columns) if columns is not None else table
+
+    batches = [batch for _, batch in _code_batches(reader, index, codes, columns)]
+    if not batches:
+        schema = reader.schema
+        return (pa.schema([schema.field(c) for c in columns]) if columns is not None else schema).empty_table()
+    return pa.Table.from_batches(batches)
+
+def load_numpy(path: str, codes, columns) -> dict:
+    """
+    返回 {code: {column: np.ndarray}}。
+    数值/时间列在不压缩文件中是 mmap 上的只读零拷贝视图；字符串列或含 null 的非浮点列会复制。
+    """
+    reader, index = _open(path)
+    result = {}
+    for code, batch in _code_batches(reader, index, codes, columns):
+        result[code] = {}
+        for name in columns:
+            array = batch.column(name)
+            zero_copy = array.null_count == 0 and (pa.types.is_primitive(array.type) and not pa.types.is_boolean(array.type))
+            result[code][name] = array.to_numpy(zero_copy_only=zero_copy)
+    return result
+
+# ==================== 命令行：parquet → arrow ====================
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python scripts/arrow_ipc.py <合并 parquet 文件> [uncompressed|lz4]")
+        sys.exit(1)
+    parquet_path = sys.argv[1]
+    compression = sys.argv[2] if len(sys.argv) > 2 else "uncompressed"
+    path = os.path.splitext(parquet_path)[0] + ".arrow"
+    rows = export_parquet(parquet_path, path, compression)
+    print(f"✅ 已导出 {rows:,} 行至 {path}（{compression}），索引：{index_path(path)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# scripts/benchmark_parquet.py
+# 功能：用与真实数据同形态的合成 K线 / 资金流数据，对 parquet_profiles.PROFILES 中的每个配置
+#       测量 文件大小 / 写入耗时 / 全量读取耗时 / 按 code 过滤读取耗时，并输出对比表
+# 用法：python scripts/benchmark_parquet.py   （规模可用环境变量 BENCH_CODES / BENCH_DAYS 调整）
+
+import os
+import json
+import time
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from parquet_profiles import PROFILES, DEFAULT_PROFILE, get_profile, writer_options, duckdb_copy_options
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# ==================== 配置 ====================
+BENCH_CODES = int(os.getenv("BENCH_CODES", 500))     # 合成股票数
+BENCH_DAYS = int(os.getenv("BENCH_DAYS", 4000))      # 最长历史交易日数（约16年）
+REPEAT = int(os.getenv("BENCH_REPEAT", 3))           # 每项耗时取 REPEAT 次中的最小值
+FILTER_SAMPLES = 5                                   # 过滤读取抽样的股票数
+SEED = 20251121
+REPORT_FILE = "benchmark_parquet_report.json"
+# 资金流的 DuckDB COPY 写法：名称 → COPY 选项（旧写法 + collect_fundflow 当前按默认 profile 的写法）
+DUCKDB_COPY_BASELINES = {
+    "duckdb_copy": "COMPRESSION 'ZSTD'",
+    f"duckdb_copy_{DEFAULT_PROFILE}": duckdb_copy_options(get_profile(DEFAULT_PROFILE)),
+}
+
+# ==================== 合成数据 ====================
+def _codes(n: int):
+    return [f"{('sh', 'sz', 'bj')[i % 3]}.{600000 + i:06d}" for i in range(n)]
+
+def _histories(rng):
+    """每只股票一段以最近交易日为终点、长度不一的历史（模拟新股与老股混合）"""
+    all_dates = pd.bdate_range(end="2025-11-21", periods=BENCH_DAYS)
+    for code in _codes(BENCH_CODES):
+        length = int(rng.integers(BENCH_DAYS // 20, BENCH_DAYS + 1))
+        yield code, all_dates[-length:]
+
+def make_kdata(rng) -> pd.DataFrame:
+    dfs = []
+    for code, dates in _histories(rng):
+        n = len(dates)
+        pct = rng.normal(0, 0.02, n).clip(-0.1, 0.1)
+        close = np.round(rng.uniform(3, 80) * np.cumprod(1 + pct), 2)
+        preclose = np.round(np.concatenate([[close[0]], close[:-1]]), 2)
+        high = np.round(close * (1 + rng.uniform(0, 0.03, n)), 2)
+        low = np.round(close * (1 - rng.uniform(0, 0.03, n)), 2)
+        open_ = np.round(rng.uniform(low, high), 2)
+        volume = np.round(rng.lognormal(15, 1, n), -2)
+        dfs.append(pd.DataFrame({
+            "date": dates, "code": code,
+            "open": open_, "high": high, "low": low, "close": close, "preclose": preclose,
+            "volume": volume, "amount": np.round(volume * close, 4),
+            "turn": np.round(rng.uniform(0.1, 10, n), 6), "pctChg": np.round(pct * 100, 6),
+            "isST": np.where(rng.random(n) < 0.01, "1", "0"),
+        }))
+    return pd.concat(dfs, ignore_index=True)
+
+def make_fundflow(rng) -> pd.DataFrame:
+    dfs = []
+    for code, dates in _histories(rng):
+        n = len(dates)
+        pct = rng.normal(0, 0.02, n).clip(-0.1, 0.1)
+        close = np.round(rng.uniform(3, 80) * np.cumprod(1 + pct), 2)
+        # 新浪资金流单位为万元，下载时已 ×10000
+        flows = {col: np.round(rng.normal(0, 2000, n), 2) * 10000 for col in (
+            "main_net_flow", "super_large_net_flow", "large_net_flow", "medium_small_net_flow")}
+        dfs.append(pd.DataFrame({
+            "date": dates.strftime("%Y-%m-%d"), "code": code,
+            "close": close, "pct_change": np.round(pct, 6), "turnover_rate": np.round(rng.uniform(0.001, 0.1, n), 6),
+            "net_flow_amount": flows["main_net_flow"] + flows["medium_small_net_flow"],
+            **flows,
+        }))
+    return pd.concat(dfs, ignore_index=True)
+
+# ==================== 计时 ====================
+def _best_of(fn):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_profile(table: pa.Table, name: str, path: str, sample_codes) -> dict:
+    profile = get_profile(name)
+    options = writer_options(table.schema, profile)
+
+    def write():
+        pq.write_table(table, path, row_group_size=profile["row_group_size"], **options)
+
+    return _measure(name, write, path, sample_codes)
+
+def bench_duckdb_copy(table: pa.Table, name: str, path: str, sample_codes, copy_options: str) -> dict:
+    """资金流合并文件由 DuckDB COPY 写出，用同样的写法作为基线"""
+    con = duckdb.connect()
+    con.register("bench_table", table)
+
+    def write():
+        con.execute(f"COPY (SELECT * FROM bench_table) TO '{path}' (FORMAT PARQUET, {copy_options})")
+
+    try:
+        return _measure(name, write, path, sample_codes)
+    finally:
+        con.close()
+
+def _measure(name: str, write, path: str, sample_codes) -> dict:
+    def read_full():
+        pq.read_table(path).to_pandas()
+
+    def read_filtered():
+        for code in sample_codes:
+            pq.read_table(path, filters=[("code", "==", code)]).to_pandas()
+
+    write_s = _best_of(write)
+    return {
+        "profile": name,
+        "size_mb": os.path.getsize(path) / 1024 ** 2,
+        "write_s": write_s,
+        "read_full_s": _best_of(read_full),
+        "read_filtered_ms": _best_of(read_filtered) / len(sample_codes) * 1000,
+        "row_groups": pq.ParquetFile(path).num_row_groups,
+    }
+
+def print_table(dataset: str, rows: int, results):
+    baseline = results[0]["size_mb"]
+    print(f"\n=== {dataset}（{rows:,} 行）===")
+    print(f"{'profile':<24}{'size MB':>10}{'vs legacy':>11}{'write s':>10}{'full read s':>13}{'filtered ms':>13}{'row groups':>12}")
+    for r in results:
+        print(f"{r['profile']:<24}{r['size_mb']:>10.2f}{r['size_mb'] / baseline:>10.1%} {r['write_s']:>10.3f}"
+              f"{r['read_full_s']:>13.3f}{r['read_filtered_ms']:>13.1f}{r['row_groups']:>12}")
+
+# ==================== 主流程 ====================
+def main():
+    rng = np.random.default_rng(SEED)
+    workdir = tempfile.mkdtemp(prefix="bench_parquet_")
+    report = {"codes": BENCH_CODES, "max_days": BENCH_DAYS, "default_profile": DEFAULT_PROFILE, "datasets": {}}
+    print(f"Parquet 编码基准测试：{BENCH_CODES} 只股票，最长 {BENCH_DAYS} 个交易日，每项取 {REPEAT} 次最优")
+
+    try:
+        for dataset, make in (("kdata", make_kdata), ("fundflow", make_fundflow)):
+            df = make(rng).sort_values(["code", "date"]).reset_index(drop=True)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            codes = df["code"].unique()
+            sample_codes = list(rng.choice(codes, size=min(FILTER_SAMPLES, len(codes)), replace=False))
+
+            results = [bench_profile(table, name, os.path.join(workdir, f"{dataset}_{name}.parquet"), sample_codes)
+                       for name in PROFILES]
+            if dataset == "fundflow" and duckdb is not None:
+                for name, copy_options in DUCKDB_COPY_BASELINES.items():
+                    path = os.path.join(workdir, f"{dataset}_{name}.parquet")
+                    results.append(bench_duckdb_copy(table, name, path, sample_codes, copy_options))
+            print_table(dataset, len(df), results)
+            report["datasets"][dataset] = {"rows": len(df), "results": results}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n报告已写入：{REPORT_FILE}（当前默认 profile：{DEFAULT_PROFILE}）")
+
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,18 @@ import shutil
 import json
 from tqdm import tqdm
 from pathlib import Path
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from parquet_profiles import get_profile, writer_options
 
 # ====================== 配置 ======================
 INPUT_BASE_DIR = "all_kline"                    # download-artifact 后所有 kline_part_* 都在这里
 OUTPUT_DIR_SMALL_FILES = "kdata"                # 单个股票文件目录（上传为 kdata-small-files）
 FINAL_PARQUET_FILE = "full_kdata.parquet"      # 最终合并大文件
 QC_REPORT_FILE = "data_quality_report_kline.json"
+FINAL_ARROW_FILE = "full_kdata.arrow"           # 可选：供研究环境内存映射加载
+ARROW_IPC_EXPORT = os.getenv("ARROW_IPC_EXPORT", "")   # 置为 uncompressed 或 lz4 即额外导出 Arrow IPC
 
 # ====================== 数据质量检查函数 ======================
 def run_quality_check(df: pd.DataFrame):
@@ -88,6 +94,12 @@ def run_quality_check(df: pd.DataFrame):
 # ====================== 主函数 ======================
 def main():
     print("\n开始 K线数据收集与合并流程...")
+    # 先校验 PARQUET_PROFILE，避免在读取合并全部数据后才因配置错误失败
+    try:
+        profile = get_profile()
+    except ValueError as e:
+        print(f"致命错误：{e}")
+        exit(1)
 
     # 1. 创建干净的小文件输出目录
     if os.path.exists(OUTPUT_DIR_SMALL_FILES):
@@ -141,27 +153,38 @@ def main():
     print("按股票代码排序（优化压缩）...")
     merged = merged.sort_values(['code', 'date']).reset_index(drop=True)
 
-    # 7. 保存最终大文件（ZSTD 高压缩）
-    print(f"正在写入最终合并文件：{FINAL_PARQUET_FILE}（ZSTD压缩）")
+    # 7. 保存最终大文件（按 profile 做列级编码 + ZSTD 压缩，profile 可用 PARQUET_PROFILE 指定）
+    print(f"正在写入最终合并文件：{FINAL_PARQUET_FILE}（{profile['compression'].upper()} level={profile['compression_level']}）")
     try:
-        merged.to_parquet(
+        table = pa.Table.from_pandas(merged, preserve_index=False)
+        pq.write_table(
+            table,
             FINAL_PARQUET_FILE,
-            index=False,
-            compression='zstd',
-            row_group_size=100_000,
-            engine='pyarrow'
+            row_group_size=profile['row_group_size'],
+            **writer_options(table.schema, profile)
         )
         print(f"最终大文件写入成功！")
     except Exception as e:
-        print(f"ZSTD 失败，回退到 snappy：{e}")
+        print(f"按 profile 写入失败（压缩或列级编码），回退到 snappy 默认编码：{e}")
         merged.to_parquet(FINAL_PARQUET_FILE, index=False, compression='snappy')
 
-    # 8. 执行数据质量检查
+    # 8. (可选) 导出 Arrow IPC 文件及按股票偏移索引
+    if ARROW_IPC_EXPORT:
+        print(f"正在导出 Arrow IPC 文件：{FINAL_ARROW_FILE}（{ARROW_IPC_EXPORT}）")
+        try:
+            from arrow_ipc import export_parquet
+            export_parquet(FINAL_PARQUET_FILE, FINAL_ARROW_FILE, ARROW_IPC_EXPORT)
+        except Exception as e:
+            print(f"Arrow IPC 导出失败：{e}")
+
+    # 9. 执行数据质量检查
     run_quality_check(merged)
 
     print("\nK线数据收集、合并、质检全部完成！")
     print(f"→ 小文件目录：{OUTPUT_DIR_SMALL_FILES}/")
     print(f"→ 合并大文件：{FINAL_PARQUET_FILE}")
+    if ARROW_IPC_EXPORT:
+        print(f"→ Arrow IPC：{FINAL_ARROW_FILE}")
     print(f"→ 质检报告：{QC_REPORT_FILE}")
 
 if __name__ == "__main__":
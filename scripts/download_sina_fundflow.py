@@ -9,6 +9,8 @@ from tqdm import tqdm
 import time
 import sys
 import traceback
+import hashlib
+import glob
 
 # ==================== 配置 ====================
 OUTPUT_DIR = "data_fundflow"
@@ -16,6 +18,11 @@ PAGE_SIZE = 50
 TASK_INDEX = int(os.getenv("TASK_INDEX", 0))
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# (新增) 原始响应磁盘缓存：置空 SINA_CACHE_DIR 即关闭缓存
+CACHE_DIR = os.getenv("SINA_CACHE_DIR", "cache_sina_fundflow")
+REPLAY = os.getenv("FUNDFLOW_REPLAY", "0") == "1"   # 回放模式：只读缓存，不发任何网络请求
+TAIL_TTL = 3600              # 末页(不满 PAGE_SIZE 条，仍会随新交易日增长)缓存有效期(秒)
+
 SINA_API = "https://vip.stock.finance.sina.com.cn/quotes_service/api/json_v2.php/MoneyFlow.ssl_qsfx_lscjfb"
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -34,24 +41,141 @@ FINAL_COLS = [
     'large_net_flow', 'medium_small_net_flow'
 ]
 
-# ==================== 下载函数 (保持不变) ====================
+# ==================== 响应缓存 ====================
+# 缓存以 (code, page, num, 排序方向) 的哈希为键，保存新浪返回的原始 GBK 字节，外加一个 .meta.json。
+# 下载按日期正序分页(asc=1)：新交易日只会追加到末页，已满 PAGE_SIZE 条且日期递增的页
+# 内容不再变化，缓存后不再过期；末页(不满一页或空页)只保留 TAIL_TTL 秒。
+# 若接口某页返回的不是正序数据，该页同样按末页处理，不会被当作不可变页长期复用。
+# 拼接时校验相邻页日期严格递增，并在缓存页之后需要下载新页时重新下载最后一个缓存页比对；
+# 若新浪删除旧数据或插入数据导致分页错位，该股票的缓存会被整体清除并从网络重新下载。
+# 不改变行数的历史修正只能在其所在页恰好被重新比对时发现。
+def _cache_path(code: str, page: int) -> str:
+    key = hashlib.sha1(f"{code}|{page}|{PAGE_SIZE}|asc".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, key[:2], key)
+
+def _read_meta(meta_file: str):
+    try:
+        with open(meta_file, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _is_expired(meta: dict) -> bool:
+    return not meta.get("complete") and time.time() - meta.get("fetched_at", 0) > TAIL_TTL
+
+def _cache_load(code: str, page: int, ignore_ttl: bool = False):
+    """返回缓存的原始字节；缓存不存在或末页已过期时返回 None"""
+    if not CACHE_DIR:
+        return None
+    path = _cache_path(code, page)
+    meta = _read_meta(path + ".meta.json")
+    if meta is None or (not ignore_ttl and _is_expired(meta)):
+        return None
+    try:
+        with open(path + ".raw", "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _remove_entry(path: str):
+    for suffix in (".raw", ".meta.json"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def _cache_purge(code: str):
+    """删除某只股票的全部缓存页"""
+    page = 1
+    while CACHE_DIR and os.path.exists(_cache_path(code, page) + ".meta.json"):
+        _remove_entry(_cache_path(code, page))
+        page += 1
+
+def prune_cache(keep_codes) -> int:
+    """删除不属于本分区的股票及已过期末页的缓存，控制 CI 缓存体积；返回删除的条目数"""
+    keep_codes = set(keep_codes)
+    removed = 0
+    for meta_file in glob.glob(os.path.join(CACHE_DIR, "*", "*.meta.json")):
+        meta = _read_meta(meta_file)
+        if meta is None or meta.get("code") not in keep_codes or _is_expired(meta):
+            _remove_entry(meta_file[:-len(".meta.json")])
+            removed += 1
+    return removed
+
+def _cache_store(code: str, page: int, raw: bytes, complete: bool):
+    if not CACHE_DIR:
+        return
+    path = _cache_path(code, page)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    meta = {"code": code, "page": page, "num": PAGE_SIZE,
+            "complete": complete, "fetched_at": time.time()}
+    # 先写临时文件再 os.replace，防止分片中途被杀时留下半截缓存
+    for suffix, mode, content in ((".raw", "wb", raw),
+                                  (".meta.json", "w", json.dumps(meta, ensure_ascii=False))):
+        tmp = f"{path}{suffix}.tmp"
+        with open(tmp, mode) as f:
+            f.write(content)
+        os.replace(tmp, path + suffix)
+
+def _is_complete_page(data) -> bool:
+    """已满一页且日期严格递增的页视为不可变"""
+    if len(data) != PAGE_SIZE:
+        return False
+    dates = [row.get("opendate") or "" for row in data]
+    return all(a < b for a, b in zip(dates, dates[1:]))
+
+def list_cached_codes():
+    """回放模式下没有任务分片时，从缓存中枚举所有已缓存第1页的股票"""
+    codes = set()
+    for meta_file in glob.glob(os.path.join(CACHE_DIR, "*", "*.meta.json")):
+        meta = _read_meta(meta_file)
+        if meta and meta.get("page") == 1 and meta.get("num") == PAGE_SIZE:
+            codes.add(meta["code"])
+    return [{"code": c} for c in sorted(codes)]
+
+# ==================== 下载函数 ====================
+def _fetch_page(code_api: str, page: int) -> bytes:
+    url = f"{SINA_API}?page={page}&num={PAGE_SIZE}&sort=opendate&asc=1&daima={code_api}"
+    r = requests.get(url, headers=HEADERS, timeout=30)
+    r.raise_for_status()
+    return r.content
+
 def get_fundflow(code: str) -> pd.DataFrame:
-    # ... (此函数内容与您之前的版本完全相同)
     all_data = []
     page = 1
+    use_cache = True
+    prev_cached_raw = None      # 上一页来自缓存时的原始字节，用于校验分页是否错位
     code_api = code.replace('.', '')
     while True:
-        url = f"{SINA_API}?page={page}&num={PAGE_SIZE}&sort=opendate&asc=0&daima={code_api}"
         try:
-            r = requests.get(url, headers=HEADERS, timeout=30)
-            r.raise_for_status()
-            r.encoding = 'gbk'
-            data = r.json()
+            raw = _cache_load(code, page, ignore_ttl=REPLAY) if use_cache else None
+            fetched = raw is None
+            if fetched:
+                if REPLAY: break   # 回放模式下缓存缺页即视为结束
+                raw = _fetch_page(code_api, page)
+                data = json.loads(raw.decode('gbk'))
+                # 缓存页后接新下载的页时，重新下载上一页比对：新浪删除旧数据或插入数据
+                # 会使之后所有页整体错位，最后一个缓存页必然随之变化
+                shifted = prev_cached_raw is not None and _fetch_page(code_api, page - 1) != prev_cached_raw
+                _cache_store(code, page, raw, _is_complete_page(data or []))
+            else:
+                data = json.loads(raw.decode('gbk'))
+                shifted = False
+            # 相邻页必须首尾衔接(日期严格递增)，否则说明缓存页与当前分页错位
+            if data and all_data and (data[0].get("opendate") or "") <= (all_data[-1].get("opendate") or ""):
+                shifted = True
+            if shifted and use_cache:
+                if REPLAY:
+                    print(f"  -> ⚠️ {code} 缓存分页不连续，回放截止于第 {page} 页")
+                    break
+                print(f"  -> ⚠️ {code} 缓存分页与最新数据错位，清除缓存后重新下载")
+                _cache_purge(code)
+                all_data, page, use_cache, prev_cached_raw = [], 1, False, None
+                continue
             if not data: break
             all_data.extend(data)
             if len(data) < PAGE_SIZE: break
+            prev_cached_raw = None if fetched else raw
             page += 1
-            time.sleep(0.3)
+            if fetched: time.sleep(0.3)
         except Exception:
             break
     return pd.DataFrame(all_data) if all_data else pd.DataFrame()
@@ -59,13 +183,25 @@ def get_fundflow(code: str) -> pd.DataFrame:
 # ==================== 主流程 (已修改) ====================
 def main():
     print(f"\n2025全市场资金流下载（统一信源：新浪财经）- 分区 {TASK_INDEX + 1}")
+    if REPLAY:
+        print(f"🔁 回放模式：仅从缓存 {CACHE_DIR}/ 重建 {OUTPUT_DIR}/，不访问网络")
+        if not CACHE_DIR:
+            print("❌ 致命错误: 回放模式需要设置 SINA_CACHE_DIR！"); sys.exit(1)
 
     task_file = f"tasks/task_slice_{TASK_INDEX}.json"
     try:
         with open(task_file) as f:
             stocks = json.load(f)
     except FileNotFoundError:
-        print(f"❌ 致命错误: 未找到任务分片文件 {task_file}！"); sys.exit(1)
+        if not REPLAY:
+            print(f"❌ 致命错误: 未找到任务分片文件 {task_file}！"); sys.exit(1)
+        stocks = list_cached_codes()
+
+    # 先清理不属于本分区的股票和已过期的末页，确保随后保存的 CI 缓存只含本分区数据
+    if CACHE_DIR and not REPLAY:
+        removed = prune_cache(s["code"] for s in stocks)
+        if removed:
+            print(f"🧹 已清理 {removed} 条不属于本分区或已过期的缓存")
 
     if not stocks:
         print("🟡 本分区任务列表为空，正常结束。")
@@ -73,10 +209,16 @@ def main():
 
     print(f"本分区共 {len(stocks)} 只标的")
     success_count = 0
+    replay_missing = []
 
     for s in tqdm(stocks, desc=f"分区 {TASK_INDEX+1} 下载中"):
         code = s["code"]
         name = s.get("name", "")
+
+        # 回放模式下没有缓存第1页的股票直接跳过，避免用空文件覆盖已有结果
+        if REPLAY and _cache_load(code, 1, ignore_ttl=True) is None:
+            replay_missing.append(code)
+            continue
         
         # --- (这是唯一的、关键的修正) ---
         try:
@@ -130,6 +272,8 @@ def main():
     # --------------------------------------------------
 
     print(f"\n分区 {TASK_INDEX + 1} 完成！其中包含有效数据的股票有 {success_count}/{len(stocks)} 只。")
+    if replay_missing:
+        print(f"🟡 回放模式：{len(replay_missing)} 只股票缺少缓存第1页，已跳过：{', '.join(replay_missing)}")
     # 不再需要任何 if success_count == 0 的判断
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+# scripts/parquet_profiles.py
+# 输出 Parquet 文件的编码/压缩配置：collect_kdata / collect_fundflow / benchmark_parquet 共用
+# （列级编码只用于 pyarrow 写出的 K线文件；资金流由 DuckDB COPY 写出，见下方说明）
+#
+# 每个 profile 描述一组写入参数：
+#   compression / compression_level  压缩算法与级别 (level=None 表示 pyarrow 默认)
+#   row_group_size                   每个 row group 的行数，决定按 code 过滤时能跳过多少数据
+#   delta_dates                      日期列用 DELTA 编码 (整数/时间戳→DELTA_BINARY_PACKED，字符串→DELTA_BYTE_ARRAY)
+#   byte_stream_split                对高基数浮点列(成交量/金额/比率/资金流)用 BYTE_STREAM_SPLIT 编码，提升 ZSTD 压缩率；
+#                                    两位小数的价格列重复值多，保留字典编码反而更小，不在此列
+# 未指定编码的列(code/isST/价格等)沿用 pyarrow 默认的字典编码
+# 各 profile 的实测数据见 scripts/benchmark_parquet.py。300 只股票合成数据上的结果：
+#   tuned_zstd3 vs legacy        K线文件 77%，写入快 40~55%，全量读取快 15~35%
+#   tuned_zstd3 vs legacy_zstd3  同为 level 3 时，仅编码变化带来的文件大小约 81%（两类数据均如此）
+#   tuned_zstd3_bss_prices       价格列改用 BYTE_STREAM_SPLIT 后 K线文件大约 40%（为 legacy 的 109%），资金流大约 7%
+#   tuned_zstd9                  文件仅再小约 1%，写入耗时翻倍；rg50k 按 code 过滤读取快约 35%，文件大 1~3%
+# 注意 legacy 是 pyarrow 写法，只对应 K线的历史输出。资金流合并文件一直由 DuckDB COPY 写出，
+# 资金流上 DuckDB COPY 为 19.95 MB，比所有 pyarrow profile 都小（tuned_zstd3 为 20.60 MB，大约 3%），
+# 因此资金流继续用 COPY，只从 profile 取压缩级别和 row group 大小（见 duckdb_copy_options）。
+
+import os
+
+import pyarrow as pa
+
+DATE_COLUMNS = ("date",)
+BYTE_STREAM_SPLIT_COLUMNS = [
+    "volume", "amount", "turn", "pctChg",
+    "pct_change", "turnover_rate", "net_flow_amount", "main_net_flow",
+    "super_large_net_flow", "large_net_flow", "medium_small_net_flow",
+]
+PRICE_COLUMNS = ["open", "high", "low", "close", "preclose"]
+
+PROFILES = {
+    # 历史写法：全部默认编码 + ZSTD 默认级别
+    "legacy": {
+        "compression": "zstd", "compression_level": None, "row_group_size": 100_000,
+        "delta_dates": False, "byte_stream_split": None,
+    },
+    # 对照组：历史编码 + ZSTD level 3，用于把压缩级别的收益与编码的收益分开
+    "legacy_zstd3": {
+        "compression": "zstd", "compression_level": 3, "row_group_size": 100_000,
+        "delta_dates": False, "byte_stream_split": None,
+    },
+    "tuned_zstd3": {
+        "compression": "zstd", "compression_level": 3, "row_group_size": 100_000,
+        "delta_dates": True, "byte_stream_split": BYTE_STREAM_SPLIT_COLUMNS,
+    },
+    # 对照组：价格列也用 BYTE_STREAM_SPLIT，用于验证价格列保留字典编码的选择
+    "tuned_zstd3_bss_prices": {
+        "compression": "zstd", "compression_level": 3, "row_group_size": 100_000,
+        "delta_dates": True, "byte_stream_split": BYTE_STREAM_SPLIT_COLUMNS + PRICE_COLUMNS,
+    },
+    "tuned_zstd9": {
+        "compression": "zstd", "compression_level": 9, "row_group_size": 100_000,
+        "delta_dates": True, "byte_stream_split": BYTE_STREAM_SPLIT_COLUMNS,
+    },
+    "tuned_zstd3_rg50k": {
+        "compression": "zstd", "compression_level": 3, "row_group_size": 50_000,
+        "delta_dates": True, "byte_stream_split": BYTE_STREAM_SPLIT_COLUMNS,
+    },
+}
+DEFAULT_PROFILE = "tuned_zstd3"
+
+
+def get_profile(name: str = None) -> dict:
+    """按名称取 profile；未指定时读取环境变量 PARQUET_PROFILE，再退回 DEFAULT_PROFILE"""
+    name = name or os.getenv("PARQUET_PROFILE") or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"未知的 Parquet profile: {name}（可选: {', '.join(PROFILES)}）")
+    profile = dict(PROFILES[name])
+    # 运行环境缺少 ZSTD 时回退到 snappy
+    if not pa.Codec.is_available(profile["compression"]):
+        profile["compression"], profile["compression_level"] = "snappy", None
+    return profile
+
+
+def writer_options(schema: pa.Schema, profile: dict) -> dict:
+    """把 profile 展开成 pq.ParquetWriter / pq.write_table 的关键字参数（row_group_size 除外）"""
+    column_encoding = {}
+    for field in schema:
+        if profile["delta_dates"] and field.name in DATE_COLUMNS:
+            if pa.types.is_integer(field.type) or pa.types.is_timestamp(field.type) or pa.types.is_date32(field.type):
+                column_encoding[field.name] = "DELTA_BINARY_PACKED"
+            elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+                column_encoding[field.name] = "DELTA_BYTE_ARRAY"
+        elif profile["byte_stream_split"] and field.name in profile["byte_stream_split"] \
+                and pa.types.is_floating(field.type):
+            column_encoding[field.name] = "BYTE_STREAM_SPLIT"
+
+    options = {
+        "compression": profile["compression"],
+        "compression_level": profile["compression_level"],
+    }
+    if column_encoding:
+        # pyarrow 不允许对启用字典编码的列再指定 column_encoding
+        options["use_dictionary"] = [name for name in schema.names if name not in column_encoding]
+        options["column_encoding"] = column_encoding
+    return options
+
+
+def duckdb_copy_options(profile: dict) -> str:
+    """把 profile 的压缩算法、级别和 row group 大小展开成 DuckDB COPY ... (FORMAT PARQUET, ...) 的选项（不含列级编码）"""
+    options = [f"COMPRESSION '{profile['compression'].upper()}'", f"ROW_GROUP_SIZE {profile['row_group_size']}"]
+    if profile["compression_level"] is not None:
+        options.append(f"COMPRESSION_LEVEL {profile['compression_level']}")
+    return ", ".join(options)
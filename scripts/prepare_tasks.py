@@ -1,7 +1,7 @@
 # scripts/prepare_tasks.py
 import baostock as bs
 import json
-import random
+import zlib
 import os
 from datetime import datetime, timedelta
 
@@ -41,11 +41,12 @@ def main():
         # stock_list = stock_list[0:100]   # 删除此行即全量
         print(f"测试模式：仅处理前 {len(stock_list)} 只")
 
-        random.shuffle(stock_list)
-        chunk_size = (len(stock_list) + TASK_COUNT - 1) // TASK_COUNT
+        # 按代码的稳定哈希分区：同一只股票每次都落在同一分区，资金流下载的 CI 缓存才能跨次复用
+        slices = [[] for _ in range(TASK_COUNT)]
+        for stock in stock_list:
+            slices[zlib.crc32(stock['code'].encode()) % TASK_COUNT].append(stock)
 
-        for i in range(TASK_COUNT):
-            subset = stock_list[i * chunk_size: (i + 1) * chunk_size]
+        for i, subset in enumerate(slices):
             path = os.path.join(OUTPUT_DIR, f"task_slice_{i}.json")
             with open(path, "w", encoding="utf-8") as f:
                 json.dump(subset, f, ensure_ascii=False, indent=2)